@@ -6,22 +6,47 @@ fetches associated conversation threads, and outputs structured JSON
 with PII (phone/email) redacted.
 """
 
-import json
+import hashlib
 import logging
 import os
+import random
 import re
 import sys
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import cache
 
+import orjson
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession
 
 BASE_URL = "https://api.hostaway.com/v1"
-REQUEST_DELAY = 0.7
 MAX_RETRIES = 3
 BACKOFF_BASE = 2
+BACKOFF_CAP = 30
 PAGE_LIMIT = 50
+MAX_WORKERS = 4
+# Each message worker may page through a long thread on its own MAX_WORKERS pool.
+POOL_MAXSIZE = MAX_WORKERS * (MAX_WORKERS + 1)
+# Hostaway allows 15 req/10s per IP; one slot is kept back for network jitter.
+RATE_LIMIT_REQUESTS = 14
+RATE_LIMIT_PERIOD = 10
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HTTP_CACHE_DIR = os.path.join(PROJECT_DIR, ".cache")
+TOKEN_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "hostaway", "token.json")
+TOKEN_EXPIRY_MARGIN = 60
+TOKEN_COOLDOWN = 1
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+CANCELLED_STATUSES = frozenset({"cancelled", "canceled", "declined"})
+NON_DIGIT_PATTERN = re.compile(r"\D")
+ASCII_NON_DIGITS = bytes(c for c in range(128) if not chr(c).isdigit())
 
 logging.basicConfig(
     level=logging.INFO,
@@ -30,7 +55,130 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-session = requests.Session()
+
+def http_cache_ttl():
+    """Seconds to cache GET responses for, from HOSTAWAY_CACHE_TTL (0 disables)."""
+    raw_ttl = os.getenv("HOSTAWAY_CACHE_TTL") or "0"
+    try:
+        return int(raw_ttl)
+    except ValueError:
+        logger.warning("Ignoring HOSTAWAY_CACHE_TTL=%r: expected whole seconds", raw_ttl)
+        return 0
+
+
+def http_cache_path(account_id):
+    """Return this account's response cache file, created owner-only.
+
+    requests-cache leaves the Authorization header out of its cache key, so
+    each account gets its own file; it holds unredacted guest data.
+    """
+    digest = hashlib.sha256(account_id.encode()).hexdigest()[:16]
+    path = os.path.join(HTTP_CACHE_DIR, f"http_cache_{digest}.sqlite")
+    os.makedirs(HTTP_CACHE_DIR, mode=0o700, exist_ok=True)
+    os.close(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600))
+    os.chmod(path, 0o600)
+    return path
+
+
+def create_session(account_id=None, cache_ttl=0):
+    """Create the shared HTTP session with a keep-alive pool for the worker threads.
+
+    Given an ``account_id`` and a positive ``cache_ttl``, repeated GETs are
+    served from that account's on-disk cache; cache hits skip the network and
+    the rate limiter, so development reruns only wait on requests that miss.
+    """
+    if account_id and cache_ttl > 0:
+        http_session = CachedSession(
+            http_cache_path(account_id),
+            backend="sqlite",
+            expire_after=cache_ttl,
+            allowable_methods=("GET",),
+            cache_control=True,
+            stale_if_error=True,
+        )
+    else:
+        http_session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+    http_session.mount("https://", adapter)
+    http_session.mount("http://", adapter)
+    return http_session
+
+
+session = create_session()
+
+
+class RateLimiter:
+    """Allow at most ``limit`` requests in any ``period``-second window.
+
+    Shared by all worker threads. Each caller reserves the next free slot
+    under the lock and sleeps outside it, so callers only wait when the
+    window is actually full. A 429 halves the limit for everyone and each
+    success adds one back, up to the configured ``max_limit``.
+    """
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.max_limit = limit
+        self.period = period
+        self._slots = deque()
+        self._not_before = 0.0
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        while self._slots and self._slots[0] <= now - self.period:
+            self._slots.popleft()
+
+    def acquire(self):
+        """Wait for a free slot and return it, for ``release()``."""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            start = now
+            while len(self._slots) >= self.limit:
+                start = self._slots.popleft() + self.period
+            start = max(start, self._not_before)
+            self._slots.append(start)
+        if start > now:
+            time.sleep(start - now)
+        return start
+
+    def release(self, slot):
+        """Hand back a slot whose request never reached the API."""
+        with self._lock:
+            try:
+                self._slots.remove(slot)
+            except ValueError:
+                pass
+
+    def pause(self, seconds):
+        """Hold back every request until ``seconds`` from now."""
+        with self._lock:
+            self._not_before = max(self._not_before, time.monotonic() + seconds)
+
+    def throttle(self, seconds):
+        """Back off after a 429: pause everyone and halve the limit."""
+        with self._lock:
+            self._not_before = max(self._not_before, time.monotonic() + seconds)
+            self.limit = max(1, self.limit // 2)
+
+    def recover(self):
+        """Give back one request of headroom after a successful response."""
+        with self._lock:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+    def update_from_headers(self, headers):
+        """Shrink the local window to the server's X-RateLimit-Remaining, if sent."""
+        remaining = headers.get("X-RateLimit-Remaining")
+        if not isinstance(remaining, str) or not remaining.isdigit():
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            for _ in range(self.limit - len(self._slots) - int(remaining)):
+                self._slots.append(now)
+
+
+rate_limiter = RateLimiter(RATE_LIMIT_REQUESTS, RATE_LIMIT_PERIOD)
 
 
 class HostawayError(Exception):
@@ -49,7 +197,9 @@ class ApiError(HostawayError):
     """Raised when the API returns an error."""
 
 
+@cache
 def load_credentials():
+    """Read credentials from the environment / .env once per process."""
     load_dotenv()
     account_id = os.getenv("HOSTAWAY_ACCOUNT_ID")
     api_key = os.getenv("HOSTAWAY_API_KEY")
@@ -62,40 +212,52 @@ def load_credentials():
     return account_id, api_key
 
 
-def api_request(method, url, headers=None, data=None, params=None):
+def api_request(method, url, data=None, params=None):
     """Make an API request with retry logic and rate limit handling."""
+    delay = BACKOFF_BASE
     for attempt in range(MAX_RETRIES):
+        slot = rate_limiter.acquire()
         try:
             response = session.request(
-                method, url, headers=headers, data=data, params=params, timeout=30
+                method, url, data=data, params=params, timeout=30
             )
+            from_cache = getattr(response, "from_cache", False)
+            if from_cache:
+                # Served from the local cache: the stored rate-limit headers are stale.
+                rate_limiter.release(slot)
+            else:
+                rate_limiter.update_from_headers(response.headers)
+            status = response.status_code
 
-            if response.status_code == 429:
+            if 200 <= status < 300:
+                if not from_cache:
+                    rate_limiter.recover()
+                return orjson.loads(response.content)
+
+            if status == 429:
                 retry_after = response.headers.get("Retry-After")
-                if retry_after:
-                    try:
-                        wait_time = int(retry_after)
-                    except ValueError:
-                        wait_time = BACKOFF_BASE ** (attempt + 1)
+                if retry_after and retry_after.isdigit():
+                    wait_time = int(retry_after)
                 else:
-                    wait_time = BACKOFF_BASE ** (attempt + 1)
+                    # Decorrelated jitter, so workers hit together don't retry together.
+                    delay = min(BACKOFF_CAP, random.uniform(BACKOFF_BASE, delay * 3))
+                    wait_time = delay
                 logger.warning(
-                    "Rate limited (429). Retrying in %ds (attempt %d/%d)",
+                    "Rate limited (429). Retrying in %.1fs (attempt %d/%d)",
                     wait_time,
                     attempt + 1,
                     MAX_RETRIES,
                 )
-                time.sleep(wait_time)
+                rate_limiter.throttle(wait_time)
                 continue
 
-            if response.status_code == 401:
+            if status == 401:
                 raise AuthenticationError("Authentication failed. Check your credentials.")
 
-            if response.status_code == 403:
+            if status == 403:
                 raise AuthenticationError("Access forbidden. Check your API permissions.")
 
-            response.raise_for_status()
-            return response.json()
+            raise ApiError(f"API error {status}: {response.text[:200]}")
 
         except requests.exceptions.ConnectionError as e:
             if attempt < MAX_RETRIES - 1:
@@ -123,9 +285,6 @@ def api_request(method, url, headers=None, data=None, params=None):
             else:
                 raise NetworkError(f"Request timed out after {MAX_RETRIES} attempts") from e
 
-        except requests.exceptions.HTTPError as e:
-            raise ApiError(f"API error {response.status_code}") from e
-
     raise ApiError(f"Request failed after {MAX_RETRIES} retries")
 
 
@@ -148,12 +307,74 @@ def authenticate(account_id, api_key):
     if not token:
         raise AuthenticationError("No access token in response")
 
-    logger.info("Authentication successful. Waiting 1s before making API calls...")
-    time.sleep(1)
+    save_cached_token(account_id, token, response.get("expires_in"))
+
+    logger.info("Authentication successful. API calls resume after a %ds cooldown.", TOKEN_COOLDOWN)
+    rate_limiter.pause(TOKEN_COOLDOWN)
 
     return token
 
 
+def load_cached_token(account_id):
+    """Return the cached access token for this account if it is still valid."""
+    try:
+        with open(TOKEN_CACHE_PATH, "rb") as f:
+            cached = orjson.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(cached, dict) or cached.get("account_id") != account_id:
+        return None
+    expires_at = cached.get("expires_at")
+    if not isinstance(expires_at, (int, float)):
+        return None
+    if time.time() >= expires_at - TOKEN_EXPIRY_MARGIN:
+        return None
+    return cached.get("token")
+
+
+def save_cached_token(account_id, token, expires_in):
+    """Persist an access token so reruns can skip authentication.
+
+    Best effort: the file is written atomically with owner-only permissions,
+    and any failure just means the next run authenticates again.
+    """
+    if not expires_in:
+        return
+    tmp_path = f"{TOKEN_CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(TOKEN_CACHE_PATH), exist_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps({
+                "account_id": account_id,
+                "token": token,
+                "expires_at": time.time() + int(expires_in),
+            }))
+        os.replace(tmp_path, TOKEN_CACHE_PATH)
+    except (OSError, ValueError) as e:
+        logger.warning("Could not cache access token: %s", e)
+
+
+def clear_cached_token():
+    """Forget the cached access token, e.g. after the API rejected it."""
+    try:
+        os.remove(TOKEN_CACHE_PATH)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning("Could not clear cached access token: %s", e)
+
+
+def get_access_token(account_id, api_key):
+    """Return ``(token, cached)``, authenticating only when no cached token is valid."""
+    token = load_cached_token(account_id)
+    if token:
+        logger.info("Using cached access token")
+        return token, True
+    return authenticate(account_id, api_key), False
+
+
 def build_headers(token):
     return {
         "Authorization": f"Bearer {token}",
@@ -161,42 +382,49 @@ def build_headers(token):
     }
 
 
-def fetch_all_pages(url, headers, params=None):
-    """Fetch all pages from a paginated endpoint."""
-    all_results = []
-    offset = 0
-    base_params = dict(params) if params else {}
+def iter_all_pages(url, params=None):
+    """Yield every item from a paginated endpoint, page by page.
 
-    while True:
-        page_params = {**base_params, "limit": PAGE_LIMIT, "offset": offset}
+    The first page reports the total ``count``; the remaining pages are
+    then fetched in parallel and yielded in offset order.
+    """
+    base_params = {**(params or {}), "limit": PAGE_LIMIT}
 
+    def fetch_page(offset):
+        page_params = {**base_params, "offset": offset}
         logger.info("Fetching %s (offset=%d)", url, offset)
-        response = api_request("GET", url, headers=headers, params=page_params)
+        return api_request("GET", url, params=page_params)
+
+    response = fetch_page(0)
+    result = response.get("result")
+    if not result:
+        logger.warning("Empty result at offset %d", 0)
+        return
 
-        result = response.get("result")
-        if not result:
-            if offset == 0:
-                logger.warning("Empty result at offset %d", offset)
-            break
+    yield from result
 
-        all_results.extend(result)
+    remaining_offsets = range(PAGE_LIMIT, response.get("count", 0), PAGE_LIMIT)
+    if not remaining_offsets:
+        return
 
-        count = response.get("count", 0)
-        if offset + PAGE_LIMIT >= count:
-            break
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for page in executor.map(fetch_page, remaining_offsets):
+            result = page.get("result")
+            if not result:
+                break
+            yield from result
 
-        offset += PAGE_LIMIT
-        time.sleep(REQUEST_DELAY)
 
-    return all_results
+def fetch_all_pages(url, params=None):
+    """Fetch all pages from a paginated endpoint."""
+    return list(iter_all_pages(url, params))
 
 
-def fetch_reservations(headers):
+def fetch_reservations():
     """Fetch all reservations with resources included."""
     logger.info("Fetching reservations...")
     reservations = fetch_all_pages(
         f"{BASE_URL}/reservations",
-        headers,
         params={"includeResources": 1},
     )
     logger.info("Fetched %d total reservations", len(reservations))
@@ -205,10 +433,9 @@ def fetch_reservations(headers):
 
 def filter_non_cancelled(reservations):
     """Filter out cancelled and declined reservations."""
-    cancelled_statuses = {"cancelled", "canceled", "declined"}
     filtered = [
         r for r in reservations
-        if r.get("status", "").lower() not in cancelled_statuses
+        if (r.get("status") or "").lower() not in CANCELLED_STATUSES
     ]
     logger.info(
         "Filtered to %d non-cancelled reservations (out of %d total)",
@@ -218,20 +445,19 @@ def filter_non_cancelled(reservations):
     return filtered
 
 
-def fetch_conversations(headers):
-    """Fetch all conversations."""
+def fetch_conversations():
+    """Fetch all conversations, keyed by reservation id as pages arrive."""
     logger.info("Fetching conversations...")
-    conversations = fetch_all_pages(f"{BASE_URL}/conversations", headers)
-    logger.info("Fetched %d conversations", len(conversations))
-    return conversations
+    conversation_map = build_conversation_map(iter_all_pages(f"{BASE_URL}/conversations"))
+    logger.info("Mapped %d conversations to reservations", len(conversation_map))
+    return conversation_map
 
 
-def fetch_messages_for_conversation(conversation_id, headers):
+def fetch_messages_for_conversation(conversation_id):
     """Fetch all messages for a specific conversation."""
     logger.info("Fetching messages for conversation %d", conversation_id)
     messages = fetch_all_pages(
         f"{BASE_URL}/conversations/{conversation_id}/messages",
-        headers,
         params={"includeScheduledMessages": 1},
     )
     return messages
@@ -257,7 +483,11 @@ def redact_phone(phone):
     """Redact phone number, keeping last 4 digits."""
     if not phone:
         return phone
-    digits = re.sub(r"\D", "", str(phone))
+    text = phone if isinstance(phone, str) else str(phone)
+    if text.isascii():
+        digits = text.encode("ascii").translate(None, ASCII_NON_DIGITS).decode("ascii")
+    else:
+        digits = NON_DIGIT_PATTERN.sub("", text)
     if len(digits) <= 4:
         return "***"
     return f"***-***-{digits[-4:]}"
@@ -267,49 +497,83 @@ def redact_email(email):
     """Redact email, keeping first char and domain."""
     if not email:
         return email
-    parts = str(email).split("@")
-    if len(parts) != 2:
+    text = email if isinstance(email, str) else str(email)
+    local, at, domain = text.partition("@")
+    if not at or "@" in domain:
         return "***"
-    local = parts[0]
-    prefix = local[0] if local else ""
-    return f"{prefix}***@{parts[1]}"
+    return f"{local[:1]}***@{domain}"
+
+
+def fetch_messages(conversation_id):
+    """Fetch and shape the messages of one conversation.
 
+    Failures are logged and yield an empty thread so one bad conversation
+    does not abort the export.
+    """
+    try:
+        raw_messages = fetch_messages_for_conversation(conversation_id)
+    except HostawayError as e:
+        logger.error(
+            "Failed to fetch messages for conversation %d: %s",
+            conversation_id,
+            e,
+        )
+        return []
+    # A plain dict literal: .get() tolerates missing keys and the sender and
+    # timestamp fallbacks, and it benchmarks ~2x faster than itemgetter + zip.
+    return [
+        {
+            "id": m.get("id"),
+            "body": m.get("body"),
+            "sender": m.get("senderName") or m.get("communicationFrom"),
+            "sent_at": m.get("insertedOn") or m.get("createdOn"),
+            "status": m.get("status"),
+        }
+        for m in raw_messages
+    ]
+
+
+def iter_message_threads(conversation_ids):
+    """Yield each conversation's shaped messages, in the order given.
+
+    Hostaway has no batch messages endpoint, so this is one request per
+    conversation, spread over a thread pool.
+    """
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        yield from executor.map(fetch_messages, conversation_ids)
 
-def assemble_output(reservations, conversation_map, headers):
-    """Combine reservations with their conversation messages."""
-    enriched = []
 
-    for reservation in reservations:
-        res_id = reservation.get("id")
-        conversation = conversation_map.get(res_id)
+def has_messages(conversation):
+    """Whether a conversation's thread is worth fetching.
 
+    Only an explicit ``numberOfMessages`` of 0 skips the fetch; conversations
+    that don't report a count are fetched as before.
+    """
+    return conversation.get("numberOfMessages") != 0
+
+
+def iter_enriched(reservations, conversation_map):
+    """Yield export records for reservations, with their conversation messages.
+
+    Message threads are fetched in parallel and consumed in reservation
+    order, so records can be written out as soon as they are ready.
+    """
+    conversations = [conversation_map.get(r.get("id")) for r in reservations]
+    conversation_ids = [c.get("id") for c in conversations if c and has_messages(c)]
+
+    message_threads = iter_message_threads(conversation_ids)
+
+    for reservation, conversation in zip(reservations, conversations):
         messages = []
         conversation_id = None
 
         if conversation:
             conversation_id = conversation.get("id")
-            try:
-                raw_messages = fetch_messages_for_conversation(conversation_id, headers)
-                messages = [
-                    {
-                        "id": m.get("id"),
-                        "body": m.get("body"),
-                        "sender": m.get("senderName") or m.get("communicationFrom"),
-                        "sent_at": m.get("insertedOn") or m.get("createdOn"),
-                        "status": m.get("status"),
-                    }
-                    for m in raw_messages
-                ]
-                time.sleep(REQUEST_DELAY)
-            except HostawayError as e:
-                logger.error(
-                    "Failed to fetch messages for conversation %d: %s",
-                    conversation_id,
-                    e,
-                )
+            if has_messages(conversation):
+                messages = next(message_threads)
 
-        enriched.append({
-            "id": res_id,
+        yield {
+            "id": reservation.get("id"),
             "guest_name": reservation.get("guestName"),
             "listing_id": reservation.get("listingMapId"),
             "listing_name": reservation.get("listingName"),
@@ -331,62 +595,106 @@ def assemble_output(reservations, conversation_map, headers):
                 "message_count": len(messages),
                 "messages": messages,
             },
-        })
+        }
 
-    return {
-        "exported_at": datetime.now(timezone.utc).isoformat(),
-        "total_reservations": len(enriched),
-        "reservations": enriched,
-    }
+
+def dump_indented(value, level):
+    """Encode a value as 2-space indented JSON nested ``level`` levels deep."""
+    return orjson.dumps(value, option=orjson.OPT_INDENT_2).replace(
+        b"\n", b"\n" + b"  " * level
+    )
 
 
-def write_output(data, output_path):
-    """Write structured JSON to file."""
+def write_output(metadata, reservations, output_path):
+    """Stream the export to a JSON file one reservation at a time.
+
+    ``metadata`` holds the top-level fields written ahead of the
+    ``reservations`` array, which may be any iterable of records. The file
+    matches ``json.dump(..., indent=2)`` of the whole document. Returns the
+    number of reservations written.
+
+    Records are written to a temporary file that replaces ``output_path``
+    only once the iterable is exhausted, so a failure mid-stream leaves any
+    previous export intact.
+    """
     dir_name = os.path.dirname(output_path)
     if dir_name:
         os.makedirs(dir_name, exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+
+    count = 0
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb", buffering=OUTPUT_BUFFER_SIZE) as f:
+            f.write(b"{\n")
+            for key, value in metadata.items():
+                f.write(b"  %s: %s,\n" % (orjson.dumps(key), dump_indented(value, 1)))
+            f.write(b'  "reservations": [')
+            for record in reservations:
+                f.write(b",\n    " if count else b"\n    ")
+                f.write(dump_indented(record, 2))
+                count += 1
+            f.write(b"\n  ]\n}" if count else b"]\n}")
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
     logger.info("Output written to %s", output_path)
+    return count
 
 
 def main():
+    global session
     try:
         account_id, api_key = load_credentials()
-        token = authenticate(account_id, api_key)
-        headers = build_headers(token)
+        cache_ttl = http_cache_ttl()
+        if cache_ttl > 0:
+            # The response cache is per account, so it opens once credentials are known.
+            session = create_session(account_id, cache_ttl)
+        token, cached = get_access_token(account_id, api_key)
+        session.headers.update(build_headers(token))
 
-        reservations = fetch_reservations(headers)
+        try:
+            reservations = fetch_reservations()
+        except AuthenticationError:
+            if not cached:
+                raise
+            # Revoked token or rotated key: the .env credentials may still be good.
+            logger.warning("Cached access token was rejected. Authenticating again...")
+            clear_cached_token()
+            # The token request is form-encoded and must not carry the rejected bearer token.
+            for name in build_headers(token):
+                session.headers.pop(name, None)
+            session.headers.update(build_headers(authenticate(account_id, api_key)))
+            reservations = fetch_reservations()
 
         if not reservations:
             logger.warning("No reservations found")
-            output = {
-                "exported_at": datetime.now(timezone.utc).isoformat(),
-                "total_reservations": 0,
-                "reservations": [],
-            }
+            filtered = []
+            conversation_map = {}
         else:
             filtered = filter_non_cancelled(reservations)
 
             if not filtered:
                 logger.warning("No non-cancelled reservations found")
 
-            conversations = fetch_conversations(headers)
-            conversation_map = build_conversation_map(conversations)
-            logger.info(
-                "Mapped %d conversations to reservations", len(conversation_map)
-            )
-
-            output = assemble_output(filtered, conversation_map, headers)
+            conversation_map = fetch_conversations()
 
-        script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        output_path = os.path.join(script_dir, "output", "reservations_with_messages.json")
-        write_output(output, output_path)
+        metadata = {
+            "exported_at": datetime.now(timezone.utc).isoformat(),
+            "total_reservations": len(filtered),
+        }
+        output_path = os.path.join(PROJECT_DIR, "output", "reservations_with_messages.json")
+        total = write_output(metadata, iter_enriched(filtered, conversation_map), output_path)
 
-        logger.info("Export complete. %d reservations exported.", output["total_reservations"])
+        logger.info("Export complete. %d reservations exported.", total)
 
     except AuthenticationError as e:
         logger.error("Authentication failed: %s", e)
+        clear_cached_token()
         sys.exit(1)
     except NetworkError as e:
         logger.error("Network error: %s", e)
@@ -0,0 +1,60 @@
+"""Shared fixtures for the Hostaway export tests."""
+
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+import responses
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import hostaway_export
+from hostaway_export import RATE_LIMIT_PERIOD, RATE_LIMIT_REQUESTS, RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def mock_sleep(monkeypatch):
+    """Make every retry and rate-limit wait instant; tests can assert on it."""
+    sleep = MagicMock()
+    monkeypatch.setattr(hostaway_export.time, "sleep", sleep)
+    return sleep
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limiter(monkeypatch):
+    limiter = RateLimiter(RATE_LIMIT_REQUESTS, RATE_LIMIT_PERIOD)
+    monkeypatch.setattr(hostaway_export, "rate_limiter", limiter)
+    return limiter
+
+
+@pytest.fixture(autouse=True)
+def token_cache_path(monkeypatch, tmp_path):
+    path = str(tmp_path / "hostaway" / "token.json")
+    monkeypatch.setattr(hostaway_export, "TOKEN_CACHE_PATH", path)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def clear_credentials_cache():
+    """load_credentials is cached per process; start each test from the environment."""
+    hostaway_export.load_credentials.cache_clear()
+    yield
+    hostaway_export.load_credentials.cache_clear()
+
+
+@pytest.fixture
+def mock_session(monkeypatch):
+    monkeypatch.delenv("HOSTAWAY_CACHE_TTL", raising=False)
+    session = MagicMock()
+    monkeypatch.setattr(hostaway_export, "session", session)
+    return session
+
+
+@pytest.fixture
+def http_mock(monkeypatch):
+    """Send requests through a real pooled session, answered by ``responses``."""
+    monkeypatch.delenv("HOSTAWAY_CACHE_TTL", raising=False)
+    monkeypatch.setattr(hostaway_export, "session", hostaway_export.create_session())
+    with responses.RequestsMock() as rsps:
+        yield rsps
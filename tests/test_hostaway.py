@@ -2,35 +2,48 @@
 
 import json
 import os
-import sys
 import tempfile
-from unittest.mock import MagicMock, patch
+import threading
+from unittest.mock import call, patch
 
 import pytest
 import requests as requests_lib
+import responses
+from requests_cache import CachedSession
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
-
+import hostaway_export
 from hostaway_export import (
+    BACKOFF_CAP,
+    BASE_URL,
+    POOL_MAXSIZE,
     AuthenticationError,
     ApiError,
     NetworkError,
+    RateLimiter,
     api_request,
-    assemble_output,
     authenticate,
     build_conversation_map,
     build_headers,
+    clear_cached_token,
+    create_session,
     fetch_all_pages,
     fetch_conversations,
     fetch_reservations,
     filter_non_cancelled,
+    get_access_token,
+    http_cache_ttl,
+    iter_enriched,
+    load_cached_token,
     load_credentials,
     main,
     redact_email,
     redact_phone,
+    save_cached_token,
     write_output,
 )
 
+URL = "https://api.hostaway.com/v1/test"
+
 
 class TestLoadCredentials:
     @patch.dict(os.environ, {"HOSTAWAY_ACCOUNT_ID": "12345", "HOSTAWAY_API_KEY": "testkey"})
@@ -51,6 +64,12 @@ class TestLoadCredentials:
         with pytest.raises(ValueError, match="Missing credentials"):
             load_credentials()
 
+    @patch("hostaway_export.load_dotenv")
+    @patch.dict(os.environ, {"HOSTAWAY_ACCOUNT_ID": "12345", "HOSTAWAY_API_KEY": "testkey"})
+    def test_reads_dotenv_once(self, mock_dotenv):
+        assert load_credentials() == load_credentials()
+        mock_dotenv.assert_called_once()
+
 
 class TestBuildHeaders:
     def test_returns_correct_headers(self):
@@ -59,6 +78,121 @@ class TestBuildHeaders:
         assert headers["Content-Type"] == "application/json"
 
 
+class TestCreateSession:
+    def test_mounts_pooled_adapter(self):
+        http_session = create_session()
+        adapter = http_session.get_adapter("https://api.hostaway.com/v1/reservations")
+        assert adapter._pool_maxsize == POOL_MAXSIZE
+        assert adapter.max_retries.total == 0
+
+    def test_plain_session_without_cache_ttl(self):
+        assert not isinstance(create_session("12345"), CachedSession)
+        assert not isinstance(create_session(cache_ttl=300), CachedSession)
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_cache_ttl_from_env(self):
+        assert http_cache_ttl() == 0
+        os.environ["HOSTAWAY_CACHE_TTL"] = "300"
+        assert http_cache_ttl() == 300
+        os.environ["HOSTAWAY_CACHE_TTL"] = "5m"
+        assert http_cache_ttl() == 0
+
+    def test_cached_session_is_owner_only(self, monkeypatch, tmp_path):
+        cache_dir = tmp_path / "cache"
+        monkeypatch.setattr(hostaway_export, "HTTP_CACHE_DIR", str(cache_dir))
+        http_session = create_session("12345", 300)
+        assert isinstance(http_session, CachedSession)
+        assert http_session.settings.expire_after == 300
+        assert http_session.settings.allowable_methods == ("GET",)
+        adapter = http_session.get_adapter("https://api.hostaway.com/v1/reservations")
+        assert adapter._pool_maxsize == POOL_MAXSIZE
+        http_session.close()
+        assert os.stat(cache_dir).st_mode & 0o777 == 0o700
+        (cache_file,) = cache_dir.iterdir()
+        assert os.stat(cache_file).st_mode & 0o777 == 0o600
+
+    def test_cache_is_per_account(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(hostaway_export, "HTTP_CACHE_DIR", str(tmp_path))
+        with responses.RequestsMock() as rsps:
+            rsps.get(URL, json={"result": ["account A"]})
+            rsps.get(URL, json={"result": ["account B"]})
+            session_a = create_session("11111", 300)
+            session_b = create_session("22222", 300)
+            session_a.get(URL)
+            response = session_b.get(URL)
+            assert not response.from_cache
+            assert response.json() == {"result": ["account B"]}
+            assert len(rsps.calls) == 2
+        session_a.close()
+        session_b.close()
+
+
+class TestRateLimiter:
+    @patch("hostaway_export.time.monotonic", return_value=100.0)
+    def test_allows_burst_up_to_limit(self, mock_monotonic, mock_sleep):
+        limiter = RateLimiter(3, 10)
+        for _ in range(3):
+            limiter.acquire()
+        assert not mock_sleep.called
+
+    @patch("hostaway_export.time.monotonic", return_value=100.0)
+    def test_waits_for_oldest_slot_when_full(self, mock_monotonic, mock_sleep):
+        limiter = RateLimiter(2, 10)
+        limiter.acquire()
+        limiter.acquire()
+        limiter.acquire()
+        mock_sleep.assert_called_once_with(10.0)
+
+    @patch("hostaway_export.time.monotonic")
+    def test_frees_slots_after_period(self, mock_monotonic, mock_sleep):
+        limiter = RateLimiter(2, 10)
+        mock_monotonic.return_value = 100.0
+        limiter.acquire()
+        limiter.acquire()
+        mock_monotonic.return_value = 110.0
+        limiter.acquire()
+        assert not mock_sleep.called
+
+    @patch("hostaway_export.time.monotonic")
+    def test_pause_holds_back_next_acquire(self, mock_monotonic, mock_sleep):
+        limiter = RateLimiter(5, 10)
+        mock_monotonic.return_value = 100.0
+        limiter.pause(1)
+        limiter.acquire()
+        mock_sleep.assert_called_once_with(1.0)
+        mock_monotonic.return_value = 101.5
+        limiter.acquire()
+        mock_sleep.assert_called_once()
+
+    @patch("hostaway_export.time.monotonic", return_value=100.0)
+    def test_syncs_with_remaining_header(self, mock_monotonic, mock_sleep):
+        limiter = RateLimiter(5, 10)
+        limiter.acquire()
+        limiter.update_from_headers({"X-RateLimit-Remaining": "0"})
+        limiter.acquire()
+        mock_sleep.assert_called_once_with(10.0)
+
+    @patch("hostaway_export.time.monotonic", return_value=100.0)
+    def test_ignores_missing_or_invalid_header(self, mock_monotonic, mock_sleep):
+        limiter = RateLimiter(2, 10)
+        limiter.update_from_headers({})
+        limiter.update_from_headers({"X-RateLimit-Remaining": "unknown"})
+        limiter.acquire()
+        limiter.acquire()
+        assert not mock_sleep.called
+
+    @patch("hostaway_export.time.monotonic", return_value=100.0)
+    def test_throttle_halves_limit_and_recover_restores(self, mock_monotonic, mock_sleep):
+        limiter = RateLimiter(4, 10)
+        limiter.throttle(3)
+        assert limiter.limit == 2
+        limiter.acquire()
+        mock_sleep.assert_called_once_with(3.0)
+        for _ in range(5):
+            limiter.recover()
+        assert limiter.limit == 4
+
+
 class TestFilterNonCancelled:
     def test_excludes_cancelled_reservations(self):
         reservations = [
@@ -102,6 +236,27 @@ class TestFilterNonCancelled:
         ids = [r["id"] for r in result]
         assert ids == [3]
 
+    def test_only_excludes_cancellation_statuses(self):
+        reservations = [
+            {"id": 1, "status": "expired"},
+            {"id": 2, "status": "inquiry"},
+            {"id": 3, "status": "pending"},
+            {"id": 4, "status": "canceled"},
+        ]
+        result = filter_non_cancelled(reservations)
+        ids = [r["id"] for r in result]
+        assert ids == [1, 2, 3]
+
+    def test_keeps_reservations_without_status(self):
+        reservations = [
+            {"id": 1, "status": None},
+            {"id": 2},
+            {"id": 3, "status": "canceled"},
+        ]
+        result = filter_non_cancelled(reservations)
+        ids = [r["id"] for r in result]
+        assert ids == [1, 2]
+
 
 class TestRedactPhone:
     def test_redacts_full_phone(self):
@@ -119,6 +274,13 @@ class TestRedactPhone:
     def test_handles_formatted_phone(self):
         assert redact_phone("(555) 123-4567") == "***-***-4567"
 
+    def test_handles_numeric_phone(self):
+        assert redact_phone(15551234567) == "***-***-4567"
+
+    def test_handles_non_ascii_phone(self):
+        assert redact_phone("☎ +1 555 123 4567") == "***-***-4567"
+        assert redact_phone("٠١٢٣٤٥٦٧٨٩") == "***-***-٦٧٨٩"
+
 
 class TestRedactEmail:
     def test_redacts_email(self):
@@ -136,6 +298,12 @@ class TestRedactEmail:
     def test_preserves_domain(self):
         assert redact_email("guest@airbnb.com") == "g***@airbnb.com"
 
+    def test_rejects_multiple_at_signs(self):
+        assert redact_email("a@b@c.com") == "***"
+
+    def test_handles_empty_local_part(self):
+        assert redact_email("@test.com") == "***@test.com"
+
 
 class TestBuildConversationMap:
     def test_maps_by_reservation_id(self):
@@ -162,7 +330,7 @@ class TestBuildConversationMap:
         result = build_conversation_map([])
         assert result == {}
 
-    def test_warns_on_duplicate_reservation_id(self):
+    def test_warns_on_duplicate_reservation_id(self, caplog):
         conversations = [
             {"id": 100, "reservationId": 1},
             {"id": 200, "reservationId": 1},
@@ -170,136 +338,142 @@ class TestBuildConversationMap:
         result = build_conversation_map(conversations)
         assert result[1]["id"] == 200
         assert len(result) == 1
+        assert "Multiple conversations for reservation 1" in caplog.text
+
+    def test_consumes_conversations_in_one_pass(self):
+        conversations = iter([
+            {"id": 100, "reservationId": 1},
+            {"id": 200, "reservationId": 2},
+        ])
+        result = build_conversation_map(conversations)
+        assert sorted(result) == [1, 2]
 
 
 class TestApiRequest:
-    @patch("hostaway_export.session")
-    def test_successful_request(self, mock_session):
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {"status": "success", "result": []}
-        mock_response.raise_for_status = MagicMock()
-        mock_session.request.return_value = mock_response
-
-        result = api_request("GET", "https://api.hostaway.com/v1/test")
+    def test_successful_request(self, http_mock):
+        http_mock.get(URL, json={"status": "success", "result": []})
+
+        result = api_request("GET", URL)
         assert result == {"status": "success", "result": []}
 
-    @patch("hostaway_export.session")
-    def test_auth_failure_raises(self, mock_session):
-        mock_response = MagicMock()
-        mock_response.status_code = 401
-        mock_session.request.return_value = mock_response
+    def test_decodes_utf8_body(self, http_mock):
+        http_mock.get(URL, body='{"result": [{"guestName": "Zoë 🏖"}]}'.encode("utf-8"))
+
+        result = api_request("GET", URL)
+        assert result == {"result": [{"guestName": "Zoë 🏖"}]}
+
+    def test_sends_session_headers_and_params(self, http_mock):
+        http_mock.get(URL, json={"result": []})
+        hostaway_export.session.headers.update(build_headers("fake_token"))
+
+        api_request("GET", URL, params={"limit": 50, "offset": 100})
+        request = http_mock.calls[0].request
+        assert request.headers["Authorization"] == "Bearer fake_token"
+        assert request.url == f"{URL}?limit=50&offset=100"
+
+    def test_auth_failure_raises(self, http_mock):
+        http_mock.get(URL, status=401)
 
         with pytest.raises(AuthenticationError, match="Authentication failed"):
-            api_request("GET", "https://api.hostaway.com/v1/test")
+            api_request("GET", URL)
 
-    @patch("hostaway_export.session")
-    def test_forbidden_raises(self, mock_session):
-        mock_response = MagicMock()
-        mock_response.status_code = 403
-        mock_session.request.return_value = mock_response
+    def test_forbidden_raises(self, http_mock):
+        http_mock.get(URL, status=403)
 
         with pytest.raises(AuthenticationError, match="Access forbidden"):
-            api_request("GET", "https://api.hostaway.com/v1/test")
+            api_request("GET", URL)
 
-    @patch("hostaway_export.time.sleep")
-    @patch("hostaway_export.session")
-    def test_rate_limit_retries(self, mock_session, mock_sleep):
-        rate_limited = MagicMock()
-        rate_limited.status_code = 429
-        rate_limited.headers = {}
+    def test_server_error_raises_api_error(self, http_mock):
+        http_mock.get(URL, status=500, body="Internal Server Error")
 
-        success = MagicMock()
-        success.status_code = 200
-        success.json.return_value = {"status": "success"}
-        success.raise_for_status = MagicMock()
+        with pytest.raises(ApiError, match="API error 500: Internal Server Error"):
+            api_request("GET", URL)
+        assert len(http_mock.calls) == 1
 
-        mock_session.request.side_effect = [rate_limited, success]
+    def test_rate_limit_retries(self, http_mock, mock_sleep):
+        http_mock.get(URL, status=429)
+        http_mock.get(URL, json={"status": "success"})
 
-        result = api_request("GET", "https://api.hostaway.com/v1/test")
+        result = api_request("GET", URL)
         assert result == {"status": "success"}
         assert mock_sleep.called
 
-    @patch("hostaway_export.time.sleep")
-    @patch("hostaway_export.session")
-    def test_rate_limit_respects_retry_after(self, mock_session, mock_sleep):
-        rate_limited = MagicMock()
-        rate_limited.status_code = 429
-        rate_limited.headers = {"Retry-After": "5"}
+    def test_rate_limit_respects_retry_after(self, http_mock, mock_sleep):
+        http_mock.get(URL, status=429, headers={"Retry-After": "5"})
+        http_mock.get(URL, json={"status": "success"})
 
-        success = MagicMock()
-        success.status_code = 200
-        success.json.return_value = {"status": "success"}
-        success.raise_for_status = MagicMock()
+        api_request("GET", URL)
+        assert mock_sleep.call_args[0][0] == pytest.approx(5, abs=0.1)
 
-        mock_session.request.side_effect = [rate_limited, success]
+    def test_rate_limit_backs_off_shared_limiter(self, http_mock, mock_sleep, fresh_rate_limiter):
+        http_mock.get(URL, status=429)
 
-        api_request("GET", "https://api.hostaway.com/v1/test")
-        mock_sleep.assert_called_with(5)
+        with pytest.raises(ApiError):
+            api_request("GET", URL)
+        assert fresh_rate_limiter.limit == 1
+        for sleep_call in mock_sleep.call_args_list:
+            assert sleep_call[0][0] <= BACKOFF_CAP
 
-    @patch("hostaway_export.time.sleep")
-    @patch("hostaway_export.session")
-    def test_rate_limit_exhausts_retries(self, mock_session, mock_sleep):
-        rate_limited = MagicMock()
-        rate_limited.status_code = 429
-        rate_limited.headers = {}
-        mock_session.request.return_value = rate_limited
+    def test_rate_limit_exhausts_retries(self, http_mock, mock_sleep):
+        http_mock.get(URL, status=429)
 
         with pytest.raises(ApiError, match="failed after"):
-            api_request("GET", "https://api.hostaway.com/v1/test")
-
-    @patch("hostaway_export.time.sleep")
-    @patch("hostaway_export.session")
-    def test_connection_error_retries(self, mock_session, mock_sleep):
-        mock_session.request.side_effect = [
-            requests_lib.exceptions.ConnectionError("Connection refused"),
-            requests_lib.exceptions.ConnectionError("Connection refused"),
-            requests_lib.exceptions.ConnectionError("Connection refused"),
-        ]
+            api_request("GET", URL)
+        assert len(http_mock.calls) == 3
+
+    def test_connection_error_retries(self, http_mock, mock_sleep):
+        http_mock.get(URL, body=requests_lib.exceptions.ConnectionError("Connection refused"))
 
         with pytest.raises(NetworkError, match="Connection failed"):
-            api_request("GET", "https://api.hostaway.com/v1/test")
-
-    @patch("hostaway_export.time.sleep")
-    @patch("hostaway_export.session")
-    def test_timeout_retries_then_fails(self, mock_session, mock_sleep):
-        mock_session.request.side_effect = [
-            requests_lib.exceptions.Timeout("Request timed out"),
-            requests_lib.exceptions.Timeout("Request timed out"),
-            requests_lib.exceptions.Timeout("Request timed out"),
-        ]
+            api_request("GET", URL)
+        assert len(http_mock.calls) == 3
+
+    def test_timeout_retries_then_fails(self, http_mock, mock_sleep):
+        http_mock.get(URL, body=requests_lib.exceptions.Timeout("Request timed out"))
 
         with pytest.raises(NetworkError, match="timed out"):
-            api_request("GET", "https://api.hostaway.com/v1/test")
+            api_request("GET", URL)
         assert mock_sleep.call_count == 2
 
-    @patch("hostaway_export.time.sleep")
-    @patch("hostaway_export.session")
-    def test_timeout_recovers_on_retry(self, mock_session, mock_sleep):
-        success = MagicMock()
-        success.status_code = 200
-        success.json.return_value = {"status": "success"}
-        success.raise_for_status = MagicMock()
-
-        mock_session.request.side_effect = [
-            requests_lib.exceptions.Timeout("Request timed out"),
-            success,
-        ]
+    def test_timeout_recovers_on_retry(self, http_mock, mock_sleep):
+        http_mock.get(URL, body=requests_lib.exceptions.Timeout("Request timed out"))
+        http_mock.get(URL, json={"status": "success"})
 
-        result = api_request("GET", "https://api.hostaway.com/v1/test")
+        result = api_request("GET", URL)
         assert result == {"status": "success"}
         assert mock_sleep.call_count == 1
 
+    def test_cache_hits_do_not_use_rate_limit_slots(self, monkeypatch, tmp_path, mock_sleep):
+        monkeypatch.setattr(hostaway_export, "HTTP_CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(hostaway_export, "session", create_session("12345", 300))
+
+        with responses.RequestsMock() as rsps:
+            rsps.get(URL, json={"result": []}, headers={"X-RateLimit-Remaining": "0"})
+            api_request("GET", URL)
+
+            # A rerun: the cached response, and its stale "0 remaining", is replayed.
+            monkeypatch.setattr(hostaway_export, "rate_limiter", RateLimiter(2, 10))
+            mock_sleep.reset_mock()
+            for _ in range(5):
+                assert api_request("GET", URL) == {"result": []}
+            hostaway_export.rate_limiter.acquire()
+            assert len(rsps.calls) == 1
+
+        hostaway_export.session.close()
+        assert not mock_sleep.called
+
 
 class TestAuthenticate:
-    @patch("hostaway_export.time.sleep")
     @patch("hostaway_export.api_request")
-    def test_returns_token(self, mock_api, mock_sleep):
+    def test_returns_token(self, mock_api, fresh_rate_limiter, mock_sleep):
         mock_api.return_value = {"access_token": "test_token_123"}
 
         token = authenticate("12345", "secret_key")
         assert token == "test_token_123"
-        mock_sleep.assert_called_with(1)
+        assert not mock_sleep.called
+
+        fresh_rate_limiter.acquire()
+        assert mock_sleep.call_args[0][0] == pytest.approx(1, abs=0.1)
 
     @patch("hostaway_export.api_request")
     def test_raises_on_missing_token(self, mock_api):
@@ -309,38 +483,123 @@ class TestAuthenticate:
             authenticate("12345", "bad_key")
 
 
+class TestTokenCache:
+    def test_round_trips_valid_token(self, token_cache_path):
+        save_cached_token("12345", "cached_token", 3600)
+        assert load_cached_token("12345") == "cached_token"
+        assert os.stat(token_cache_path).st_mode & 0o777 == 0o600
+
+    def test_ignores_token_for_other_account(self):
+        save_cached_token("12345", "cached_token", 3600)
+        assert load_cached_token("99999") is None
+
+    @patch("hostaway_export.time.time")
+    def test_ignores_token_near_expiry(self, mock_time):
+        mock_time.return_value = 1_000_000.0
+        save_cached_token("12345", "cached_token", 3600)
+        mock_time.return_value = 1_000_000.0 + 3600 - 30
+        assert load_cached_token("12345") is None
+
+    def test_ignores_missing_or_corrupt_file(self, token_cache_path):
+        assert load_cached_token("12345") is None
+        os.makedirs(os.path.dirname(token_cache_path))
+        with open(token_cache_path, "w") as f:
+            f.write("not json")
+        assert load_cached_token("12345") is None
+        for expires_at in (None, "tomorrow"):
+            with open(token_cache_path, "w") as f:
+                json.dump({"account_id": "12345", "token": "t", "expires_at": expires_at}, f)
+            assert load_cached_token("12345") is None
+
+    def test_skips_save_without_expiry(self, token_cache_path):
+        save_cached_token("12345", "cached_token", None)
+        assert not os.path.exists(token_cache_path)
+
+    def test_clear_removes_cached_token(self):
+        save_cached_token("12345", "cached_token", 3600)
+        clear_cached_token()
+        clear_cached_token()
+        assert load_cached_token("12345") is None
+
+    @patch("hostaway_export.os.remove", side_effect=PermissionError("read-only"))
+    def test_clear_tolerates_unremovable_file(self, mock_remove):
+        clear_cached_token()
+        mock_remove.assert_called_once()
+
+    @patch("hostaway_export.authenticate")
+    def test_get_access_token_prefers_cache(self, mock_auth):
+        save_cached_token("12345", "cached_token", 3600)
+        assert get_access_token("12345", "secret_key") == ("cached_token", True)
+        mock_auth.assert_not_called()
+
+    @patch("hostaway_export.api_request")
+    def test_authenticate_caches_new_token(self, mock_api, mock_sleep):
+        mock_api.return_value = {"access_token": "fresh_token", "expires_in": 3600}
+        assert get_access_token("12345", "secret_key") == ("fresh_token", False)
+        assert load_cached_token("12345") == "fresh_token"
+        assert get_access_token("12345", "secret_key") == ("fresh_token", True)
+        assert mock_api.call_count == 1
+
+
 class TestFetchAllPages:
-    @patch("hostaway_export.time.sleep")
     @patch("hostaway_export.api_request")
     def test_single_page(self, mock_api, mock_sleep):
         mock_api.return_value = {
             "result": [{"id": 1}, {"id": 2}],
             "count": 2,
         }
-        result = fetch_all_pages("https://api.hostaway.com/v1/test", {})
+        result = fetch_all_pages("https://api.hostaway.com/v1/test")
         assert len(result) == 2
         assert mock_api.call_count == 1
 
-    @patch("hostaway_export.time.sleep")
     @patch("hostaway_export.api_request")
     def test_multiple_pages(self, mock_api, mock_sleep):
         mock_api.side_effect = [
             {"result": [{"id": i} for i in range(50)], "count": 75},
             {"result": [{"id": i} for i in range(50, 75)], "count": 75},
         ]
-        result = fetch_all_pages("https://api.hostaway.com/v1/test", {})
+        result = fetch_all_pages("https://api.hostaway.com/v1/test")
         assert len(result) == 75
 
-    @patch("hostaway_export.time.sleep")
+    @patch("hostaway_export.api_request")
+    def test_requests_remaining_offsets_from_count(self, mock_api, mock_sleep):
+        def fake_api(method, url, params=None):
+            offset = params["offset"]
+            return {"result": [{"id": i} for i in range(offset, min(offset + 50, 120))], "count": 120}
+
+        mock_api.side_effect = fake_api
+        result = fetch_all_pages("https://api.hostaway.com/v1/test", params={"includeResources": 1})
+        assert [r["id"] for r in result] == list(range(120))
+        offsets = sorted(c[1]["params"]["offset"] for c in mock_api.call_args_list)
+        assert offsets == [0, 50, 100]
+        assert all(c[1]["params"]["includeResources"] == 1 for c in mock_api.call_args_list)
+        assert all(c[1]["params"]["limit"] == 50 for c in mock_api.call_args_list)
+
+    @patch("hostaway_export.api_request")
+    def test_keeps_offset_order_when_pages_finish_out_of_order(self, mock_api, mock_sleep):
+        last_page_done = threading.Event()
+
+        def fake_api(method, url, params=None):
+            offset = params["offset"]
+            if offset == 50:
+                assert last_page_done.wait(timeout=5)
+            page = {"result": [{"id": i} for i in range(offset, min(offset + 50, 150))], "count": 150}
+            if offset == 100:
+                last_page_done.set()
+            return page
+
+        mock_api.side_effect = fake_api
+        result = fetch_all_pages("https://api.hostaway.com/v1/test")
+        assert [r["id"] for r in result] == list(range(150))
+
     @patch("hostaway_export.api_request")
     def test_empty_result(self, mock_api, mock_sleep):
         mock_api.return_value = {"result": None, "count": 0}
-        result = fetch_all_pages("https://api.hostaway.com/v1/test", {})
+        result = fetch_all_pages("https://api.hostaway.com/v1/test")
         assert result == []
 
 
-class TestAssembleOutput:
-    @patch("hostaway_export.time.sleep")
+class TestIterEnriched:
     @patch("hostaway_export.fetch_messages_for_conversation")
     def test_combines_reservation_with_messages(self, mock_fetch, mock_sleep):
         mock_fetch.return_value = [
@@ -365,9 +624,9 @@ class TestAssembleOutput:
         }]
         conv_map = {100: {"id": 999, "reservationId": 100}}
 
-        result = assemble_output(reservations, conv_map, {})
-        assert result["total_reservations"] == 1
-        res = result["reservations"][0]
+        result = list(iter_enriched(reservations, conv_map))
+        assert len(result) == 1
+        res = result[0]
         assert res["guest_name"] == "John"
         assert res["reservation_details"]["phone"] == "***-***-1234"
         assert res["reservation_details"]["email"] == "j***@test.com"
@@ -375,7 +634,6 @@ class TestAssembleOutput:
         assert res["conversation"]["message_count"] == 1
         assert res["conversation"]["messages"][0]["body"] == "Hello"
 
-    @patch("hostaway_export.time.sleep")
     def test_reservation_without_conversation(self, mock_sleep):
         reservations = [{
             "id": 200,
@@ -395,17 +653,93 @@ class TestAssembleOutput:
             "hostNote": None,
         }]
 
-        result = assemble_output(reservations, {}, {})
-        res = result["reservations"][0]
+        result = list(iter_enriched(reservations, {}))
+        res = result[0]
         assert res["conversation"]["conversation_id"] is None
         assert res["conversation"]["messages"] == []
 
+    @patch("hostaway_export.fetch_messages_for_conversation")
+    def test_fetches_each_conversation_concurrently(self, mock_fetch, mock_sleep):
+        def fake_fetch(conversation_id):
+            if conversation_id == 902:
+                raise ApiError("API error 500")
+            return [{"id": conversation_id, "body": f"msg {conversation_id}"}]
+
+        mock_fetch.side_effect = fake_fetch
+        reservations = [{"id": 1}, {"id": 2}, {"id": 3}, {"id": 4}]
+        conv_map = {
+            1: {"id": 901, "reservationId": 1},
+            2: {"id": 902, "reservationId": 2},
+            4: {"id": 904, "reservationId": 4},
+        }
+
+        result = list(iter_enriched(reservations, conv_map))
+        conversations = [r["conversation"] for r in result]
+        assert [c["conversation_id"] for c in conversations] == [901, 902, None, 904]
+        assert conversations[0]["messages"][0]["body"] == "msg 901"
+        assert conversations[1]["messages"] == []
+        assert conversations[2]["messages"] == []
+        assert conversations[3]["messages"][0]["body"] == "msg 904"
+        assert mock_fetch.call_count == 3
+
+    @patch("hostaway_export.fetch_messages_for_conversation")
+    def test_message_fields_fall_back_when_missing(self, mock_fetch, mock_sleep):
+        mock_fetch.return_value = [
+            {"id": 1, "communicationFrom": "guest", "createdOn": "2026-01-01 10:00:00"},
+            {"body": "No id or status"},
+        ]
+        conv_map = {100: {"id": 999, "reservationId": 100}}
+
+        result = list(iter_enriched([{"id": 100}], conv_map))
+        messages = result[0]["conversation"]["messages"]
+        assert messages[0] == {
+            "id": 1,
+            "body": None,
+            "sender": "guest",
+            "sent_at": "2026-01-01 10:00:00",
+            "status": None,
+        }
+        assert messages[1]["body"] == "No id or status"
+        assert messages[1]["id"] is None
+
+    @patch("hostaway_export.fetch_messages_for_conversation")
+    def test_skips_fetch_for_empty_conversations(self, mock_fetch):
+        mock_fetch.return_value = [{"id": 1, "body": "Hello"}]
+        reservations = [{"id": 1}, {"id": 2}]
+        conv_map = {
+            1: {"id": 901, "reservationId": 1, "numberOfMessages": 0},
+            2: {"id": 902, "reservationId": 2, "numberOfMessages": 3},
+        }
+
+        result = list(iter_enriched(reservations, conv_map))
+        assert result[0]["conversation"] == {
+            "conversation_id": 901,
+            "message_count": 0,
+            "messages": [],
+        }
+        assert result[1]["conversation"]["message_count"] == 1
+        mock_fetch.assert_called_once_with(902)
+
+    @patch("hostaway_export.fetch_messages_for_conversation")
+    def test_message_fetches_overlap(self, mock_fetch):
+        both_in_flight = threading.Barrier(2, timeout=5)
+
+        def fake_fetch(conversation_id):
+            both_in_flight.wait()
+            return [{"id": conversation_id}]
+
+        mock_fetch.side_effect = fake_fetch
+        conv_map = {1: {"id": 901}, 2: {"id": 902}}
+
+        result = list(iter_enriched([{"id": 1}, {"id": 2}], conv_map))
+        assert [r["conversation"]["messages"][0]["id"] for r in result] == [901, 902]
+
 
 class TestFetchReservations:
     @patch("hostaway_export.fetch_all_pages")
     def test_fetches_with_include_resources(self, mock_fetch):
         mock_fetch.return_value = [{"id": 1}, {"id": 2}]
-        result = fetch_reservations({"Authorization": "Bearer token"})
+        result = fetch_reservations()
         assert len(result) == 2
         call_args = mock_fetch.call_args
         assert call_args[1]["params"]["includeResources"] == 1
@@ -413,50 +747,88 @@ class TestFetchReservations:
     @patch("hostaway_export.fetch_all_pages")
     def test_returns_empty_when_no_reservations(self, mock_fetch):
         mock_fetch.return_value = []
-        result = fetch_reservations({"Authorization": "Bearer token"})
+        result = fetch_reservations()
         assert result == []
 
 
 class TestFetchConversations:
-    @patch("hostaway_export.fetch_all_pages")
-    def test_fetches_all_conversations(self, mock_fetch):
-        mock_fetch.return_value = [{"id": 100}, {"id": 200}]
-        result = fetch_conversations({"Authorization": "Bearer token"})
-        assert len(result) == 2
+    @patch("hostaway_export.iter_all_pages")
+    def test_maps_conversations_as_they_arrive(self, mock_iter):
+        mock_iter.return_value = iter([
+            {"id": 100, "reservationId": 1},
+            {"id": 200, "reservationId": 2},
+            {"id": 300, "reservationId": None},
+        ])
+        result = fetch_conversations()
+        assert result == {
+            1: {"id": 100, "reservationId": 1},
+            2: {"id": 200, "reservationId": 2},
+        }
 
-    @patch("hostaway_export.fetch_all_pages")
-    def test_returns_empty_when_no_conversations(self, mock_fetch):
-        mock_fetch.return_value = []
-        result = fetch_conversations({"Authorization": "Bearer token"})
-        assert result == []
+    @patch("hostaway_export.iter_all_pages")
+    def test_returns_empty_when_no_conversations(self, mock_iter):
+        mock_iter.return_value = iter([])
+        result = fetch_conversations()
+        assert result == {}
 
 
 class TestWriteOutput:
     def test_writes_json_to_file(self):
-        data = {"test": True, "count": 5}
+        metadata = {"exported_at": "2026-02-19T00:00:00", "total_reservations": 2}
+        records = [{"id": 1, "messages": []}, {"id": 2, "messages": [{"body": "Hi"}]}]
         with tempfile.TemporaryDirectory() as tmpdir:
             output_path = os.path.join(tmpdir, "output", "test.json")
-            write_output(data, output_path)
+            count = write_output(metadata, iter(records), output_path)
 
             with open(output_path, "r") as f:
                 result = json.load(f)
-            assert result == data
+            assert result == {**metadata, "reservations": records}
+            assert count == 2
 
     def test_writes_to_flat_path(self):
-        data = {"test": True}
+        metadata = {"total_reservations": 0}
         with tempfile.TemporaryDirectory() as tmpdir:
             output_path = os.path.join(tmpdir, "test.json")
-            write_output(data, output_path)
+            count = write_output(metadata, [], output_path)
 
             with open(output_path, "r") as f:
                 result = json.load(f)
-            assert result == data
+            assert result == {"total_reservations": 0, "reservations": []}
+            assert count == 0
+
+    def test_matches_stdlib_indented_layout(self):
+        metadata = {"exported_at": "2026-02-19T00:00:00", "total_reservations": 1}
+        records = [{"id": 1, "guest_name": "Zoë", "details": {"note": "a\nb"}, "messages": []}]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = os.path.join(tmpdir, "test.json")
+            write_output(metadata, records, output_path)
+
+            with open(output_path, "r", encoding="utf-8") as f:
+                written = f.read()
+        expected = json.dumps({**metadata, "reservations": records}, indent=2, ensure_ascii=False)
+        assert written == expected
+
+    def test_failed_stream_keeps_previous_export(self):
+        def records():
+            yield {"id": 1}
+            raise ApiError("API error 500: boom")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = os.path.join(tmpdir, "test.json")
+            with open(output_path, "w") as f:
+                f.write('{"reservations": []}')
+
+            with pytest.raises(ApiError):
+                write_output({"total_reservations": 1}, records(), output_path)
+
+            with open(output_path, "r") as f:
+                assert json.load(f) == {"reservations": []}
+            assert os.listdir(tmpdir) == ["test.json"]
 
 
 class TestMain:
     @patch("hostaway_export.write_output")
-    @patch("hostaway_export.assemble_output")
-    @patch("hostaway_export.build_conversation_map")
+    @patch("hostaway_export.iter_enriched")
     @patch("hostaway_export.fetch_conversations")
     @patch("hostaway_export.filter_non_cancelled")
     @patch("hostaway_export.fetch_reservations")
@@ -465,30 +837,28 @@ class TestMain:
     @patch("hostaway_export.load_credentials")
     def test_full_pipeline(
         self, mock_creds, mock_auth, mock_headers, mock_fetch_res,
-        mock_filter, mock_fetch_conv, mock_conv_map, mock_assemble, mock_write,
+        mock_filter, mock_fetch_conv, mock_iter, mock_write, mock_session,
     ):
         mock_creds.return_value = ("12345", "testkey")
         mock_auth.return_value = "fake_token"
         mock_headers.return_value = {"Authorization": "Bearer fake_token"}
         mock_fetch_res.return_value = [{"id": 1}]
         mock_filter.return_value = [{"id": 1}]
-        mock_fetch_conv.return_value = [{"id": 100, "reservationId": 1}]
-        mock_conv_map.return_value = {1: {"id": 100}}
-        mock_assemble.return_value = {
-            "exported_at": "2026-02-19T00:00:00",
-            "total_reservations": 1,
-            "reservations": [{"id": 1}],
-        }
+        mock_fetch_conv.return_value = {1: {"id": 100}}
+        mock_iter.return_value = iter([{"id": 1}])
+        mock_write.return_value = 1
 
         main()
 
         mock_creds.assert_called_once()
         mock_auth.assert_called_once_with("12345", "testkey")
+        mock_session.headers.update.assert_called_once_with({"Authorization": "Bearer fake_token"})
         mock_fetch_res.assert_called_once()
         mock_filter.assert_called_once()
         mock_fetch_conv.assert_called_once()
-        mock_assemble.assert_called_once()
+        mock_iter.assert_called_once_with([{"id": 1}], {1: {"id": 100}})
         mock_write.assert_called_once()
+        assert mock_write.call_args[0][0]["total_reservations"] == 1
 
     @patch("hostaway_export.write_output")
     @patch("hostaway_export.fetch_reservations")
@@ -496,7 +866,7 @@ class TestMain:
     @patch("hostaway_export.authenticate")
     @patch("hostaway_export.load_credentials")
     def test_handles_no_reservations(
-        self, mock_creds, mock_auth, mock_headers, mock_fetch_res, mock_write,
+        self, mock_creds, mock_auth, mock_headers, mock_fetch_res, mock_write, mock_session,
     ):
         mock_creds.return_value = ("12345", "testkey")
         mock_auth.return_value = "fake_token"
@@ -506,9 +876,9 @@ class TestMain:
         main()
 
         mock_write.assert_called_once()
-        output_data = mock_write.call_args[0][0]
-        assert output_data["total_reservations"] == 0
-        assert output_data["reservations"] == []
+        metadata, records = mock_write.call_args[0][:2]
+        assert metadata["total_reservations"] == 0
+        assert list(records) == []
 
     @patch("hostaway_export.load_credentials")
     def test_exits_on_auth_error(self, mock_creds):
@@ -518,6 +888,77 @@ class TestMain:
             main()
         assert exc_info.value.code == 1
 
+    @patch("hostaway_export.write_output")
+    @patch("hostaway_export.authenticate")
+    @patch("hostaway_export.fetch_reservations")
+    @patch("hostaway_export.load_credentials")
+    def test_reauthenticates_when_cached_token_rejected(
+        self, mock_creds, mock_fetch_res, mock_auth, mock_write, mock_session,
+    ):
+        mock_creds.return_value = ("12345", "testkey")
+        mock_fetch_res.side_effect = [AuthenticationError("Authentication failed."), []]
+        mock_auth.return_value = "fresh_token"
+        save_cached_token("12345", "revoked_token", 3600)
+
+        main()
+
+        mock_auth.assert_called_once_with("12345", "testkey")
+        assert mock_session.headers.update.call_args_list == [
+            call(build_headers("revoked_token")),
+            call(build_headers("fresh_token")),
+        ]
+        assert mock_fetch_res.call_count == 2
+        mock_write.assert_called_once()
+
+    @patch("hostaway_export.write_output")
+    @patch("hostaway_export.fetch_reservations", return_value=[])
+    @patch("hostaway_export.authenticate", return_value="fake_token")
+    @patch("hostaway_export.load_credentials", return_value=("12345", "testkey"))
+    def test_opens_account_cache_when_ttl_set(
+        self, mock_creds, mock_auth, mock_fetch_res, mock_write, monkeypatch, tmp_path,
+    ):
+        monkeypatch.setenv("HOSTAWAY_CACHE_TTL", "300")
+        monkeypatch.setattr(hostaway_export, "HTTP_CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(hostaway_export, "session", requests_lib.Session())
+
+        main()
+
+        assert isinstance(hostaway_export.session, CachedSession)
+        assert str(hostaway_export.session.cache.db_path) == hostaway_export.http_cache_path("12345")
+        hostaway_export.session.close()
+
+    @patch("hostaway_export.write_output")
+    @patch("hostaway_export.load_credentials")
+    def test_reauth_token_request_drops_rejected_headers(self, mock_creds, mock_write, http_mock):
+        mock_creds.return_value = ("12345", "testkey")
+        save_cached_token("12345", "revoked_token", 3600)
+        http_mock.get(f"{BASE_URL}/reservations", status=401)
+        http_mock.post(f"{BASE_URL}/accessTokens", json={"access_token": "fresh_token", "expires_in": 3600})
+        http_mock.get(f"{BASE_URL}/reservations", json={"result": [], "count": 0})
+
+        main()
+
+        token_request = http_mock.calls[1].request
+        assert token_request.headers["Content-Type"] == "application/x-www-form-urlencoded"
+        assert "Authorization" not in token_request.headers
+        assert http_mock.calls[2].request.headers["Authorization"] == "Bearer fresh_token"
+        mock_write.assert_called_once()
+
+    @patch("hostaway_export.authenticate")
+    @patch("hostaway_export.fetch_reservations")
+    @patch("hostaway_export.load_credentials")
+    def test_clears_rejected_cached_token(self, mock_creds, mock_fetch_res, mock_auth, mock_session):
+        mock_creds.return_value = ("12345", "testkey")
+        mock_fetch_res.side_effect = AuthenticationError("Authentication failed.")
+        mock_auth.return_value = "fresh_token"
+        save_cached_token("12345", "revoked_token", 3600)
+
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+        assert exc_info.value.code == 1
+        mock_auth.assert_called_once()
+        assert load_cached_token("12345") is None
+
     @patch("hostaway_export.load_credentials")
     def test_exits_on_missing_env(self, mock_creds):
         mock_creds.side_effect = ValueError("Missing credentials")